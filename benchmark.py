@@ -0,0 +1,139 @@
+"""Micro-benchmarks for the calculator's expression evaluation hot paths.
+
+Run with:
+    uv run benchmark.py
+"""
+
+import timeit
+import tracemalloc
+import warnings
+
+import numpy as np
+from scipy import integrate
+from scipy.differentiate import derivative
+
+import calculator
+
+
+def _legacy_integrand(expression: str):
+    """The original integrand: eval() with a freshly merged globals dict per sample."""
+    return lambda x: eval(expression, {"__builtins__": {}, "x": x, **calculator._EVAL_ALLOWED_NAMES})
+
+
+def _time(function, number: int) -> float:
+    """Best-of-five wall time per call, in seconds."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def bench_integrand(expression: str = "x**2 * math.sin(x) + exp(-x)", upper_bound: float = 200.0):
+    """Per-sample cost of numerical_integrate's integrand on an integrate.quad workload."""
+    compiled = calculator._univariate_function(expression)
+    legacy = _legacy_integrand(expression)
+
+    evaluations = integrate.quad(compiled, 0.0, upper_bound, limit=200, full_output=True)[2]["neval"]
+    quad_legacy = _time(lambda: integrate.quad(legacy, 0.0, upper_bound, limit=200), number=5)
+    quad_compiled = _time(lambda: integrate.quad(compiled, 0.0, upper_bound, limit=200), number=5)
+
+    print(f"integrate.quad of '{expression}' over [0, {upper_bound}] ({evaluations} evaluations)")
+    print(f"  legacy eval integrand: {quad_legacy / evaluations * 1e6:8.3f} us/sample  {quad_legacy * 1e3:8.3f} ms/integral")
+    print(f"  compiled integrand:    {quad_compiled / evaluations * 1e6:8.3f} us/sample  {quad_compiled * 1e3:8.3f} ms/integral")
+    print(f"  speedup: {quad_legacy / quad_compiled:.1f}x")
+
+
+def _peak_memory(function) -> int:
+    """Peak bytes allocated (NumPy buffers included) while running function once."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_blocked(
+    expression: str = "sin(x)**2 + cos(x)*exp(-x/3) + sqrt(x + 1) * log(x + 2)",
+    points: int = 10_000_000,
+    block_sizes: tuple[int, ...] = (4_096, 16_384, 65_536),
+):
+    """Naive whole-array NumPy evaluation vs the blocked engine at several block sizes."""
+    program = calculator._compile_expression(expression, ("x",), backend="blocked").function
+    x = np.linspace(0.0, 10.0, points)
+    input_mb = x.nbytes / 2**20
+
+    print(f"vectorized evaluation of '{expression}' over {points:,} points (input {input_mb:.0f} MiB)")
+    naive = _time(lambda: program.fallback(x), number=1)
+    naive_peak = _peak_memory(lambda: program.fallback(x))
+    print(f"  naive numpy:         {naive * 1e3:8.1f} ms  peak {naive_peak / 2**20:8.1f} MiB")
+    for block_size in block_sizes:
+        blocked = _time(lambda: program(x, block_size=block_size), number=1)
+        blocked_peak = _peak_memory(lambda: program(x, block_size=block_size))
+        print(f"  blocked ({block_size:>6}):   {blocked * 1e3:8.1f} ms  peak {blocked_peak / 2**20:8.1f} MiB")
+
+
+def bench_vectorized_integration(terms: int = 30, upper_bound: float = 20.0):
+    """Scalar integrate.quad vs the vectorized Gauss–Kronrod mode on a long integrand."""
+    expression = " + ".join(f"sin({k}*x)*exp(-x/{k})" for k in range(1, terms + 1))
+    print(f"numerical_integrate of a {terms}-term integrand over [0, {upper_bound}]")
+    for method in ("quad", "vectorized"):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", integrate.IntegrationWarning)
+            calculator.numerical_integrate(expression, 0.0, upper_bound, method=method) # Warm the expression cache
+            elapsed = _time(
+                lambda: calculator.numerical_integrate(expression, 0.0, upper_bound, method=method, use_cache=False),
+                number=5,
+            )
+        print(f"  {method + ':':<12} {elapsed * 1e3:8.3f} ms/integral")
+
+
+def bench_analytic_integration(expressions: tuple[str, ...] = ("x**3 - 2*x", "3*exp(-2*x) + sin(5*x)")):
+    """integrate.quad vs the closed-form fast path of method="auto"."""
+    for expression in expressions:
+        print(f"numerical_integrate of '{expression}' over [0, 3]")
+        for method in ("quad", "auto"):
+            calculator.numerical_integrate(expression, 0.0, 3.0, method=method) # Warm the expression cache
+            elapsed = _time(
+                lambda: calculator.numerical_integrate(expression, 0.0, 3.0, method=method, use_cache=False),
+                number=200,
+            )
+            print(f"  {method + ':':<12} {elapsed * 1e6:8.1f} us/integral")
+
+
+def _legacy_differentiand(expression: str):
+    """The original array handling of numerical_differentiate: one scalar call per stencil point."""
+    compiled = calculator._univariate_function(expression)
+
+    def function(x):
+        result = np.zeros_like(x, dtype=float)
+        for i, xi in np.ndenumerate(x):
+            result[i] = compiled(float(xi))
+        return result
+    return function
+
+
+def bench_differentiation(
+    expression: str = "x**2 * math.sin(x) + exp(-x)",
+    points: int = 1_000,
+    orders: tuple[int, ...] = (4, 6, 8),
+):
+    """scipy.differentiate.derivative with the per-element loop vs one NumPy pass per stencil."""
+    vectorized = calculator._vectorized_function(expression)
+    legacy = _legacy_differentiand(expression)
+    x = np.linspace(0.5, 5.0, points)
+    print(f"derivative of '{expression}' at {points} points")
+    for order in orders:
+        result = derivative(lambda t: vectorized(t.ravel()).reshape(t.shape), x, order=order)
+        evaluations = int(result.nfev.sum())
+        loop = _time(lambda: derivative(legacy, x, order=order), number=3)
+        batched = _time(lambda: derivative(lambda t: vectorized(t.ravel()).reshape(t.shape), x, order=order), number=3)
+        print(
+            f"  order {order}: ndenumerate {loop * 1e3:8.2f} ms  vectorized {batched * 1e3:8.2f} ms"
+            f"  ({evaluations} evaluations, speedup {loop / batched:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    bench_integrand()
+    bench_blocked()
+    bench_vectorized_integration()
+    bench_analytic_integration()
+    bench_differentiation()
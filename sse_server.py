@@ -1,5 +1,6 @@
 """SSE server for the calculator tool using MCP protocol."""
 
+import os
 import sys
 import logging
 from dotenv import load_dotenv
@@ -13,18 +14,32 @@ from calculator import (
     multiply as calculator_multiply,
     divide as calculator_divide,
     evaluate_expression as calculator_evaluate_expression,
+    evaluate_many as calculator_evaluate_many,
+    evaluate_grid as calculator_evaluate_grid,
     calculate_mean as calculator_mean,
     calculate_median as calculator_median,
     calculate_mode as calculator_mode,
     calculate_std_dev as calculator_std_dev,
     calculate_variance as calculator_variance,
     numerical_integrate as calculator_integrate,
-    numerical_differentiate as calculator_differentiate
+    integrate_batch as calculator_integrate_batch,
+    cumulative_integrate as calculator_cumulative_integrate,
+    integrate_samples as calculator_integrate_samples,
+    numerical_integrate_nd as calculator_integrate_nd,
+    numerical_differentiate as calculator_differentiate,
+    differentiate_expression as calculator_differentiate_expression,
+    differentiate_batch as calculator_differentiate_batch,
+    taylor_coefficients as calculator_taylor_coefficients,
+    configure_integral_cache,
+    get_cache_stats as calculator_cache_stats,
 )
 
 # Load environment variables (if any)
 load_dotenv()
 
+# Optional on-disk tier for the integral result cache (survives restarts)
+configure_integral_cache(path=os.getenv("CALCULATOR_INTEGRAL_CACHE_PATH"))
+
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s %(levelname)s %(message)s")
 
@@ -71,17 +86,13 @@ def divide(a: float, b: float) -> float:
     logging.info("Tool 'divide' result (if successful): %s", result)
     return result
 
-@mcp.tool(description="Evaluates a mathematical expression string (e.g., '(2+3)*4'). Supports PEMDAS/BODMAS. WARNING: Uses eval(), ensure input is trusted.")
+@mcp.tool(description="Evaluates a mathematical expression string (e.g., '(2+3)*4'). Supports PEMDAS/BODMAS and functions/constants from the math module.")
 def evaluate(expression: str) -> float:
     """
     Evaluates a mathematical expression string like "(5 + 3) * 2 / 4 - 1".
-    This tool uses Python's eval() for evaluation, which correctly handles
-    standard order of operations (PEMDAS/BODMAS).
-
-    IMPORTANT SECURITY NOTE: The underlying eval() function can execute
-    arbitrary Python code if the input 'expression' is not strictly a
-    mathematical formula. Ensure that expressions sent to this tool are
-    from trusted sources or are thoroughly sanitized.
+    The expression is parsed and checked against a whitelist of arithmetic
+    operators and math functions before it is compiled, and standard order
+    of operations (PEMDAS/BODMAS) is respected.
     """
     logging.info("Tool 'evaluate' called with expression='%s'", expression)
     try:
@@ -95,6 +106,36 @@ def evaluate(expression: str) -> float:
         logging.error("Tool 'evaluate' unexpected error for expression '%s': %s", expression, e, exc_info=True)
         raise # Re-raise for FastMCP to handle
 
+@mcp.tool(description="Evaluates one expression over arrays of variable values in a single vectorized pass. E.g., expression='x**2 + y', variables={'x': [1, 2, 3], 'y': [0, 0, 1]}.")
+def evaluate_many(expression: str, variables: dict[str, list[float]]) -> list[float]:
+    """Evaluates an expression for every set of variable bindings."""
+    logging.info("Tool 'evaluate_many' called with expression='%s', variables=%s", expression, list(variables))
+    try:
+        result = calculator_evaluate_many(expression, variables)
+        logging.info("Tool 'evaluate_many' returned %d values", len(result))
+        return result
+    except ValueError as e:
+        logging.error("Tool 'evaluate_many' error for expression '%s': %s", expression, e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'evaluate_many' unexpected error for expression '%s': %s", expression, e, exc_info=True)
+        raise
+
+@mcp.tool(description="Evaluates an expression over the mesh of several axes (e.g. f(x, y)). Each axis is a list of values or a range {'start': a, 'stop': b, 'num': n}. Returns the flattened values (row-major) with the grid shape.")
+def evaluate_grid(expression: str, axes: dict[str, list[float] | dict[str, float]], chunk_size: int = 65536) -> dict:
+    """Evaluates an expression over a multi-variable grid."""
+    logging.info("Tool 'evaluate_grid' called with expression='%s', axes=%s", expression, list(axes))
+    try:
+        result = calculator_evaluate_grid(expression, axes, chunk_size)
+        logging.info("Tool 'evaluate_grid' returned a grid of shape %s", result["shape"])
+        return result
+    except ValueError as e:
+        logging.error("Tool 'evaluate_grid' error for expression '%s': %s", expression, e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'evaluate_grid' unexpected error for expression '%s': %s", expression, e, exc_info=True)
+        raise
+
 # New statistical and calculus tools
 
 @mcp.tool(description="Calculates the mean (average) of a list of numbers.")
@@ -172,12 +213,30 @@ def variance(data: list[float], ddof: int = 1) -> float:
         logging.error("Tool 'variance' unexpected error: %s", e, exc_info=True)
         raise
 
-@mcp.tool(description="Numerically integrates an expression string (func of 'x') over an interval [a, b]. E.g., expression='x**2', a=0, b=1.")
-def integrate(expression: str, lower_bound: float, upper_bound: float) -> float:
+@mcp.tool(description="Numerically integrates an expression string (func of 'x') over an interval [a, b]. E.g., expression='x**2', a=0, b=1. method='auto' (default: exact closed form for polynomials and exp/sin/cos of linear arguments, otherwise quad), 'quad' or 'vectorized' (Gauss-Kronrod panels evaluated with NumPy, faster for long expressions). workers > 1 (auto/quad only) integrates pieces of the interval in parallel processes for expensive integrands. epsabs/epsrel set the tolerance, limit the maximum subintervals, max_evaluations and deadline (seconds) bound the cost; when they run out the best estimate so far is returned. weight='sin'|'cos' (wvar=omega), 'alg'|'alg-loga'|'alg-logb'|'alg-log' (wvar=[alpha, beta]) or 'cauchy' (wvar=c, principal value) integrates expression times that weight with QUADPACK's weighted rules; infinite bounds are allowed. full_output=True returns value, error estimate, evaluation count, the method used ('analytic', 'quad' or 'vectorized'), the weight, converged and budget_exhausted flags and cached flag.")
+def integrate(
+    expression: str,
+    lower_bound: float,
+    upper_bound: float,
+    method: str = "auto",
+    workers: int = 1,
+    epsabs: float = 1.49e-8,
+    epsrel: float = 1.49e-8,
+    limit: int | None = None,
+    max_evaluations: int | None = None,
+    deadline: float | None = None,
+    full_output: bool = False,
+    weight: str | None = None,
+    wvar: float | list[float] | None = None,
+) -> float | dict:
     """Numerically integrates an expression string."""
-    logging.info("Tool 'integrate' called with expression='%s', lower_bound=%s, upper_bound=%s", expression, lower_bound, upper_bound)
+    logging.info("Tool 'integrate' called with expression='%s', lower_bound=%s, upper_bound=%s, method=%s, workers=%s, max_evaluations=%s, deadline=%s, weight=%s, wvar=%s", expression, lower_bound, upper_bound, method, workers, max_evaluations, deadline, weight, wvar)
     try:
-        result = calculator_integrate(expression, lower_bound, upper_bound)
+        result = calculator_integrate(
+            expression, lower_bound, upper_bound, method, workers=workers, epsabs=epsabs, epsrel=epsrel,
+            limit=limit, max_evaluations=max_evaluations, deadline=deadline, full_output=full_output,
+            weight=weight, wvar=wvar,
+        )
         logging.info("Tool 'integrate' result: %s", result)
         return result
     except ValueError as e:
@@ -187,12 +246,72 @@ def integrate(expression: str, lower_bound: float, upper_bound: float) -> float:
         logging.error("Tool 'integrate' unexpected error: %s", e, exc_info=True)
         raise
 
-@mcp.tool(description="Numerically differentiates an expression string (func of 'x') at a point. E.g., expression='x**2', point=2.")
-def differentiate(expression: str, point: float) -> float:
+@mcp.tool(description="Integrates one expression (func of 'x') over many [lower_bound, upper_bound] windows in a single vectorized call. E.g., expression='x**2', bounds=[[0, 1], [1, 2]].")
+def integrate_batch(expression: str, bounds: list[list[float]]) -> list[float]:
+    """Integrates an expression over many intervals at once."""
+    logging.info("Tool 'integrate_batch' called with expression='%s' over %d intervals", expression, len(bounds))
+    try:
+        result = calculator_integrate_batch(expression, bounds)
+        logging.info("Tool 'integrate_batch' returned %d values", len(result))
+        return result
+    except ValueError as e:
+        logging.error("Tool 'integrate_batch' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'integrate_batch' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Returns the running integral of an expression (func of 'x') from lower_bound to each of `points` evenly spaced grid points up to upper_bound, from one vectorized evaluation. method='simpson' (default), 'trapezoid' or 'gauss' (15-point rule per grid cell). error_estimate=True adds a per-point error indicator. E.g., expression='cos(x)', lower_bound=0, upper_bound=3.14159, points=5.")
+def cumulative_integrate(expression: str, lower_bound: float, upper_bound: float, points: int = 101, method: str = "simpson", error_estimate: bool = False) -> dict:
+    """Computes the cumulative integral of an expression on a grid."""
+    logging.info("Tool 'cumulative_integrate' called with expression='%s', lower_bound=%s, upper_bound=%s, points=%s, method=%s", expression, lower_bound, upper_bound, points, method)
+    try:
+        result = calculator_cumulative_integrate(expression, lower_bound, upper_bound, points, method, error_estimate)
+        logging.info("Tool 'cumulative_integrate' returned %d values", len(result["values"]))
+        return result
+    except ValueError as e:
+        logging.error("Tool 'cumulative_integrate' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'cumulative_integrate' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Integrates sampled data y over sample points x or a uniform spacing dx (default 1). y and x are lists of numbers or base64-encoded little-endian float64 buffers for large data sets. method='simpson' (default), 'trapezoid' or 'romberg' (needs 2**k + 1 samples and dx). E.g., y=[0, 1, 4, 9, 16], dx=0.5.")
+def integrate_samples(y: list[float] | str, x: list[float] | str | None = None, dx: float | None = None, method: str = "simpson") -> float:
+    """Integrates sampled data."""
+    logging.info("Tool 'integrate_samples' called with %s y samples, method=%s", "packed" if isinstance(y, str) else len(y), method)
+    try:
+        result = calculator_integrate_samples(y, x, dx, method)
+        logging.info("Tool 'integrate_samples' result: %s", result)
+        return result
+    except ValueError as e:
+        logging.error("Tool 'integrate_samples' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'integrate_samples' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Integrates an expression in several variables over a box, e.g. expression='x*y + z', bounds={'x': [0, 1], 'y': [0, 2], 'z': [0, 1]}. Uses tensor Gauss rules up to 3 dimensions and quasi-Monte Carlo (Sobol/Halton) above. Returns value, error estimate, method and evaluation count.")
+def integrate_nd(expression: str, bounds: dict[str, list[float]], method: str = "auto", epsabs: float = 1e-10, epsrel: float = 1e-8, samples: int = 16384) -> dict:
+    """Integrates a multi-variable expression over a box."""
+    logging.info("Tool 'integrate_nd' called with expression='%s', bounds=%s, method=%s", expression, bounds, method)
+    try:
+        result = calculator_integrate_nd(expression, bounds, method, epsabs, epsrel, samples)
+        logging.info("Tool 'integrate_nd' result: %s", result)
+        return result
+    except ValueError as e:
+        logging.error("Tool 'integrate_nd' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'integrate_nd' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Differentiates an expression string (func of 'x') at a point. E.g., expression='x**2', point=2. method='auto' (default: cached symbolic derivative, then forward-mode automatic differentiation, then finite differences), 'symbolic', 'ad' or 'finite_difference'.")
+def differentiate(expression: str, point: float, method: str = "auto") -> float:
     """Numerically differentiates an expression string at a point."""
-    logging.info("Tool 'differentiate' called with expression='%s', point=%s", expression, point)
+    logging.info("Tool 'differentiate' called with expression='%s', point=%s, method=%s", expression, point, method)
     try:
-        result = calculator_differentiate(expression, point)
+        result = calculator_differentiate(expression, point, method=method)
         logging.info("Tool 'differentiate' result: %s", result)
         return result
     except ValueError as e:
@@ -202,6 +321,59 @@ def differentiate(expression: str, point: float) -> float:
         logging.error("Tool 'differentiate' unexpected error: %s", e, exc_info=True)
         raise
 
+@mcp.tool(description="Returns the derivative of an expression string (func of 'x') as a simplified expression string. E.g., expression='x**3 + 2*x' returns 'x ** 2 * 3 + 2'.")
+def derivative_formula(expression: str) -> str:
+    """Symbolically differentiates an expression string."""
+    logging.info("Tool 'derivative_formula' called with expression='%s'", expression)
+    try:
+        result = calculator_differentiate_expression(expression)
+        logging.info("Tool 'derivative_formula' result: %s", result)
+        return result
+    except ValueError as e:
+        logging.error("Tool 'derivative_formula' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'derivative_formula' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Differentiates an expression string (func of 'x') at many points in one call, e.g. for slope profiles. E.g., expression='sin(x)', points=[0, 1.5708, 3.1416]. Returns per-point values and success flags. method='auto' (default: symbolic derivative evaluated on all points at once, finite differences where that fails), 'symbolic' or 'finite_difference'.")
+def differentiate_batch(expression: str, points: list[float], method: str = "auto") -> dict:
+    """Differentiates an expression string at many points."""
+    logging.info("Tool 'differentiate_batch' called with expression='%s' at %d points, method=%s", expression, len(points), method)
+    try:
+        result = calculator_differentiate_batch(expression, points, method)
+        logging.info("Tool 'differentiate_batch' returned %d values", len(result["values"]))
+        return result
+    except ValueError as e:
+        logging.error("Tool 'differentiate_batch' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'differentiate_batch' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Computes the derivatives of order 0..order of an expression string (func of 'x') at a point in one pass, with the Taylor coefficients f^(n)(point)/n!. E.g., expression='exp(2*x)', point=0, order=3. method='auto' (default: Taylor-mode automatic differentiation, falling back to a shared finite-difference stencil for functions without a Taylor rule such as gamma), 'taylor' or 'finite_difference'.")
+def taylor_coefficients(expression: str, point: float, order: int = 3, method: str = "auto") -> dict:
+    """Computes higher-order derivatives and Taylor coefficients of an expression string."""
+    logging.info("Tool 'taylor_coefficients' called with expression='%s', point=%s, order=%s, method=%s", expression, point, order, method)
+    try:
+        result = calculator_taylor_coefficients(expression, point, order, method)
+        logging.info("Tool 'taylor_coefficients' result: %s", result)
+        return result
+    except ValueError as e:
+        logging.error("Tool 'taylor_coefficients' error: %s", e)
+        raise
+    except Exception as e:
+        logging.error("Tool 'taylor_coefficients' unexpected error: %s", e, exc_info=True)
+        raise
+
+@mcp.tool(description="Returns hit/miss metrics of the compiled-expression cache and the integral result cache.")
+def cache_stats() -> dict:
+    """Returns cache metrics."""
+    logging.info("Tool 'cache_stats' called")
+    result = calculator_cache_stats()
+    logging.info("Tool 'cache_stats' result: %s", result)
+    return result
+
 # Main entry point
 if __name__ == "__main__":
     try:
@@ -3,6 +3,7 @@
 import asyncio
 import json
 import logging
+import os
 from dotenv import load_dotenv
 
 # MCP server imports
@@ -21,17 +22,32 @@ from calculator import (
     multiply,
     divide,
     evaluate_expression,
+    evaluate_many,
+    evaluate_grid,
     calculate_mean,
     calculate_median,
     calculate_mode,
     calculate_std_dev,
     calculate_variance,
     numerical_integrate,
-    numerical_differentiate
+    integrate_batch,
+    cumulative_integrate,
+    integrate_samples,
+    numerical_integrate_nd,
+    numerical_differentiate,
+    differentiate_expression,
+    differentiate_batch,
+    taylor_coefficients,
+    configure_integral_cache,
+    get_cache_stats,
 )
 
 # Load environment variables (if any)
 load_dotenv()
+
+# Optional on-disk tier for the integral result cache (survives restarts)
+configure_integral_cache(path=os.getenv("CALCULATOR_INTEGRAL_CACHE_PATH"))
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 # Instantiate ADK FunctionTools
@@ -40,13 +56,23 @@ subtract_tool = FunctionTool(subtract)
 multiply_tool = FunctionTool(multiply)
 divide_tool = FunctionTool(divide)
 evaluate_expression_tool = FunctionTool(evaluate_expression)
+evaluate_many_tool = FunctionTool(evaluate_many)
+evaluate_grid_tool = FunctionTool(evaluate_grid)
 calculate_mean_tool = FunctionTool(calculate_mean)
 calculate_median_tool = FunctionTool(calculate_median)
 calculate_mode_tool = FunctionTool(calculate_mode)
 calculate_std_dev_tool = FunctionTool(calculate_std_dev)
 calculate_variance_tool = FunctionTool(calculate_variance)
 numerical_integrate_tool = FunctionTool(numerical_integrate)
+integrate_batch_tool = FunctionTool(integrate_batch)
+cumulative_integrate_tool = FunctionTool(cumulative_integrate)
+integrate_samples_tool = FunctionTool(integrate_samples)
+numerical_integrate_nd_tool = FunctionTool(numerical_integrate_nd)
 numerical_differentiate_tool = FunctionTool(numerical_differentiate)
+differentiate_expression_tool = FunctionTool(differentiate_expression)
+differentiate_batch_tool = FunctionTool(differentiate_batch)
+taylor_coefficients_tool = FunctionTool(taylor_coefficients)
+cache_stats_tool = FunctionTool(get_cache_stats)
 
 all_tools = [
     add_tool,
@@ -54,13 +80,23 @@ all_tools = [
     multiply_tool,
     divide_tool,
     evaluate_expression_tool,
+    evaluate_many_tool,
+    evaluate_grid_tool,
     calculate_mean_tool,
     calculate_median_tool,
     calculate_mode_tool,
     calculate_std_dev_tool,
     calculate_variance_tool,
     numerical_integrate_tool,
+    integrate_batch_tool,
+    cumulative_integrate_tool,
+    integrate_samples_tool,
+    numerical_integrate_nd_tool,
     numerical_differentiate_tool,
+    differentiate_expression_tool,
+    differentiate_batch_tool,
+    taylor_coefficients_tool,
+    cache_stats_tool,
 ]
 tool_map = {tool.name: tool for tool in all_tools}
 
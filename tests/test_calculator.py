@@ -1,5 +1,9 @@
 import pytest
+import base64
 import math
+import struct
+import threading
+import time
 
 from calculator import (
     add,
@@ -7,13 +11,32 @@ from calculator import (
     multiply,
     divide,
     evaluate_expression,
+    evaluate_many,
+    evaluate_grid,
     calculate_mean,
     calculate_median,
     calculate_mode,
     calculate_std_dev,
     calculate_variance,
     numerical_integrate,
+    integrate_batch,
+    cumulative_integrate,
+    integrate_samples,
+    numerical_integrate_nd,
     numerical_differentiate,
+    differentiate_expression,
+    differentiate_batch,
+    taylor_coefficients,
+    get_expression_cache_info,
+    configure_integral_cache,
+    get_integral_cache_info,
+    clear_integral_cache,
+    get_cache_stats,
+    set_expression_cache_size,
+    clear_expression_cache,
+    describe_expression,
+    set_vector_block_size,
+    expression_fingerprint,
 )
 
 # Test basic arithmetic operations
@@ -68,11 +91,176 @@ def test_evaluate_expression_invalid():
     with pytest.raises(ValueError, match="Expression did not evaluate to a numeric value."):
         evaluate_expression("math.sin") # Not a number
 
+def test_evaluate_expression_rejects_python_internals():
+    for expression in (
+        "math.__loader__",
+        "().__class__",
+        "__import__('os')",
+        "(lambda: 1)()",
+        "sin(x=1)",
+        "'abc'",
+    ):
+        with pytest.raises(ValueError, match="Invalid mathematical expression or disallowed function/variable"):
+            evaluate_expression(expression)
+
+def test_evaluate_expression_math_module_attributes():
+    assert evaluate_expression("math.factorial(5)") == 120.0
+    assert evaluate_expression("math.hypot(3, 4)") == pytest.approx(5.0)
+    assert evaluate_expression("7 // 2 + 7 % 2") == 4.0
+
+def test_evaluate_expression_constant_folding():
+    assert evaluate_expression("2**10 + math.pi/2 * 0 + 1*1") == 1025.0
+    assert evaluate_expression("--sqrt(2) ** 1") == pytest.approx(math.sqrt(2))
+    assert numerical_integrate("sqrt(2)*x + 0", 0, 1) == pytest.approx(math.sqrt(2) / 2)
+    assert numerical_differentiate("math.pi/2 * x**1", 1) == pytest.approx(math.pi / 2)
+
+def test_evaluate_expression_budget():
+    for expression in ("9**9**9", "10**10**8", "(2**64)**(2**20)", "math.factorial(10**6)", "-" * 500 + "1"):
+        with pytest.raises(ValueError, match="Expression exceeds the evaluation budget"):
+            evaluate_expression(expression)
+    with pytest.raises(ValueError, match="Expression exceeds the evaluation budget"):
+        evaluate_expression("+".join(["1"] * 5000))
+    assert evaluate_expression("2**1000 / 2**990") == 1024.0
+    assert evaluate_expression("2**-100000000") == 0.0
+    assert evaluate_expression("(-1)**(10**100)") == 1.0
+    # Every operand is under the size limit, but the gcds would take over a minute
+    expression = " + ".join(f"math.gcd(3**{600000 + i}, 2**{900000 + i})" for i in range(50))
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="Expression exceeds the evaluation budget: integer arithmetic"):
+        evaluate_expression(expression)
+    assert time.perf_counter() - start < 1
+    assert evaluate_expression("math.gcd(3**60000, 2**90000) + 3**600000 % 7") == 2.0
+
+def test_evaluate_expression_runtime_budget():
+    # The exponent depends on a variable, so the limit is enforced at evaluation time
+    assert evaluate_many("2**math.floor(x)", {"x": [3.0, 4.0]}) == [8.0, 16.0]
+    with pytest.raises(ValueError, match="Error during integration.*evaluation budget"):
+        numerical_integrate("math.factorial(math.floor(x)) / 10**6", 0, 10**6)
+    # Integers over the folding limit stay unfolded, so hashing the tree can't overflow int-to-str
+    assert numerical_integrate("math.log(math.factorial(1600) + math.floor(x))", 0, 1) == pytest.approx(10209.02, abs=0.01)
+
 def test_evaluate_expression_division_by_zero():
+    with pytest.raises(ValueError, match="Division by zero is not allowed in the expression."):
+        evaluate_expression("(1 / 0) * 1") # Not folded away, still raises at evaluation
     with pytest.raises(ValueError, match="Division by zero is not allowed in the expression."):
         evaluate_expression("1 / 0")
     with pytest.raises(ValueError, match="Division by zero is not allowed in the expression."):
         evaluate_expression("1 / (2-2)")
+# Test vectorized evaluation
+def test_evaluate_many():
+    assert evaluate_many("x**2 + y", {"x": [1, 2, 3], "y": [0, 0, 1]}) == [1.0, 4.0, 10.0]
+    values = evaluate_many("math.sin(x) + sqrt(x) + log(x, 2)", {"x": [1.0, 4.0]})
+    assert values == pytest.approx([math.sin(1.0) + 1.0, math.sin(4.0) + 2.0 + 2.0])
+    assert evaluate_many("math.factorial(3) + x", {"x": [1, 2]}) == [7.0, 8.0] # np.vectorize fallback
+    assert evaluate_many("2 * pi", {"x": [1, 2]}) == pytest.approx([2 * math.pi] * 2)
+    # The fallback is undefined at a pole per element, like the ufuncs, instead of failing the batch
+    values = evaluate_many("math.gamma(x)", {"x": [-3, 1]})
+    assert math.isnan(values[0]) and values[1] == 1.0
+
+def test_evaluate_many_invalid():
+    with pytest.raises(ValueError, match="all the same length"):
+        evaluate_many("x + y", {"x": [1, 2], "y": [1]})
+    with pytest.raises(ValueError, match="At least one variable array is required."):
+        evaluate_many("1 + 1", {})
+    with pytest.raises(ValueError, match="Invalid variable name"):
+        evaluate_many("sin + 1", {"sin": [1]})
+    with pytest.raises(ValueError, match="Invalid mathematical expression or disallowed function/variable"):
+        evaluate_many("x + z", {"x": [1]})
+    with pytest.raises(ValueError, match="Expression did not evaluate to a numeric value."):
+        evaluate_many("math.sin", {"x": [1]})
+
+def test_evaluate_many_blocked():
+    xs = [i / 1000 for i in range(5000)]
+    expression = "sin(x)**2 + cos(x)*exp(-x/3) + log(x + 2, 2) - x // 0.3 + x % 0.7"
+    expected = [
+        math.sin(x)**2 + math.cos(x) * math.exp(-x / 3) + math.log(x + 2, 2) - x // 0.3 + x % 0.7
+        for x in xs
+    ]
+    set_vector_block_size(64) # Many blocks, including a short final one
+    try:
+        assert evaluate_many(expression, {"x": xs}) == pytest.approx(expected)
+        assert evaluate_many("math.gamma(x + 1)", {"x": xs[:100]}) == pytest.approx([math.gamma(x + 1) for x in xs[:100]])
+        # Calls differing only in the attribute name must not share a register
+        assert evaluate_many("math.sinh(x) - math.cosh(x)", {"x": xs}) == pytest.approx([-math.exp(-x) for x in xs])
+    finally:
+        set_vector_block_size(16_384)
+    with pytest.raises(ValueError, match="Block size must be a positive integer."):
+        set_vector_block_size(0)
+
+def test_evaluate_grid():
+    result = evaluate_grid("10*x + y", {"x": [0, 1], "y": {"start": 0, "stop": 2, "num": 3}})
+    assert result["variables"] == ["x", "y"]
+    assert result["shape"] == [2, 3]
+    assert result["axes"]["y"] == [0.0, 1.0, 2.0]
+    assert result["values"] == [0.0, 1.0, 2.0, 10.0, 11.0, 12.0]
+    # Chunking doesn't change the result
+    chunked = evaluate_grid("10*x + y", {"x": [0, 1], "y": {"start": 0, "stop": 2, "num": 3}}, chunk_size=4)
+    assert chunked["values"] == result["values"]
+
+def test_evaluate_grid_invalid():
+    with pytest.raises(ValueError, match="At least one axis is required."):
+        evaluate_grid("1", {})
+    with pytest.raises(ValueError, match="is missing"):
+        evaluate_grid("x", {"x": {"start": 0, "stop": 1}})
+    with pytest.raises(ValueError, match="Too many points"):
+        evaluate_grid("x * y", {"x": {"start": 0, "stop": 1, "num": 10**4}, "y": {"start": 0, "stop": 1, "num": 10**4}})
+    # Checked before any axis is allocated
+    with pytest.raises(ValueError, match="Too many points"):
+        evaluate_grid("x", {"x": {"start": 0, "stop": 1, "num": 10**12}})
+
+
+# Test the compiled-expression cache
+def test_expression_cache_hits_and_misses():
+    clear_expression_cache()
+    evaluate_expression("1 + 2")
+    evaluate_expression("1 + 2")
+    numerical_integrate("x**2", 0, 1, method="quad")
+    info = get_expression_cache_info()
+    assert info["misses"] == 2
+    assert info["hits"] >= 1
+    assert info["size"] == 2
+
+def test_expression_cache_eviction():
+    clear_expression_cache()
+    set_expression_cache_size(2)
+    try:
+        for expression in ("1 + 1", "2 + 2", "3 + 3"):
+            evaluate_expression(expression)
+        info = get_expression_cache_info()
+        assert info["size"] == 2
+        assert info["evictions"] == 1
+        evaluate_expression("1 + 1") # Evicted, so this is a miss again
+        assert get_expression_cache_info()["misses"] == 4
+    finally:
+        set_expression_cache_size(256)
+        clear_expression_cache()
+
+def test_common_subexpression_elimination():
+    expression = "sin(x)**2 + sin(x)*cos(x) + cos(x)**2"
+    info = describe_expression(expression, ["x"])
+    assert info["nodes"] == 19
+    assert info["eliminated_nodes"] == 6 # One sin(x) and one cos(x) call reused
+    assert describe_expression("x + 1", ["x"])["eliminated_nodes"] == 0
+    assert numerical_integrate(expression, 0, 1) == pytest.approx(1 + math.sin(1)**2 / 2)
+    assert evaluate_many(expression, {"x": [0.0, 1.0]}) == pytest.approx([1.0, 1 + math.sin(1) * math.cos(1)])
+
+def test_expression_normalization():
+    variants = ["2*x + math.sin(x)", "sin(x) + x*2", "(( x * 2 )) + sin( x )", "x*2 + sin(x)*1"]
+    fingerprints = {expression_fingerprint(expression, ["x"]) for expression in variants}
+    assert len(fingerprints) == 1
+    assert expression_fingerprint("x*2 + sin(x)", ["x"]) != expression_fingerprint("x*3 + sin(x)", ["x"])
+    assert expression_fingerprint("x + y", ["x", "y"]) != expression_fingerprint("x + y", ["y", "x"])
+
+    clear_expression_cache()
+    for expression in variants:
+        assert numerical_integrate(expression, 0, 1, method="quad", use_cache=False) == pytest.approx(2 - math.cos(1))
+    info = get_expression_cache_info()
+    assert info["misses"] == 1
+    assert info["normalized_hits"] == 3
+
+def test_expression_cache_invalid_size():
+    with pytest.raises(ValueError, match="Cache size must be a non-negative integer."):
+        set_expression_cache_size(-1)
 
 
 # Test statistical functions
@@ -137,6 +325,294 @@ def test_numerical_integrate():
     # Integral of sin(x) from 0 to pi is 2
     assert numerical_integrate("math.sin(x)", 0, math.pi) == pytest.approx(2.0)
 
+def test_numerical_integrate_analytic():
+    for expression, exact in [
+        ("x**3 - 2*x", 0.54),
+        ("3 * exp(-2*x + 1)", 1.5 * (math.exp(0.4) - math.exp(-3.2))),
+        ("sin(math.pi * x) / 2 + cos(2*x)", (math.cos(0.3 * math.pi) - math.cos(2.1 * math.pi)) / (2 * math.pi) + (math.sin(4.2) - math.sin(0.6)) / 2),
+        ("(2*x - 1)**3 * 4", ((2 * 2.1 - 1)**4 - (2 * 0.3 - 1)**4) / 2),
+    ]:
+        result = numerical_integrate(expression, 0.3, 2.1, use_cache=False, full_output=True)
+        assert result["method"] == "analytic"
+        assert result["evaluations"] == 0
+        assert result["value"] == pytest.approx(exact, rel=1e-12)
+        assert result["value"] == pytest.approx(numerical_integrate(expression, 0.3, 2.1, method="quad"))
+        assert 0 < result["error"] < 1e-13
+    # Shifted high-degree polynomials cancel badly in monomial form
+    for expression, lower, upper in [("(x - 1000)**10", 999, 1001), ("(x - 100)**6", 99, 101)]:
+        degree = int(expression.rsplit("**", 1)[1])
+        result = numerical_integrate(expression, lower, upper, use_cache=False, full_output=True)
+        assert result["method"] == "analytic"
+        assert result["value"] == pytest.approx(2 / (degree + 1), rel=1e-15)
+
+def test_numerical_integrate_analytic_fallback():
+    for expression, lower, upper in [("x * sin(x)", 0, 1), ("x**0.5", 0, 1), ("exp(-x)", 0, math.inf)]:
+        result = numerical_integrate(expression, lower, upper, use_cache=False, full_output=True)
+        assert result["method"] == "quad"
+        assert result["evaluations"] > 0
+    with pytest.raises(ValueError, match="Error during integration"):
+        numerical_integrate("1/x", -1, 1)
+
+def test_numerical_integrate_weighted():
+    result = numerical_integrate("exp(-x) * sin(50*x)", 0, math.inf, use_cache=False, full_output=True)
+    assert result["weight"] == "sin"
+    assert result["value"] == pytest.approx(50 / 2501)
+    assert result["evaluations"] < 500
+    result = numerical_integrate("exp(-x**2) * cos(2*x)", -math.inf, math.inf, use_cache=False, full_output=True)
+    assert result["weight"] == "cos"
+    assert result["value"] == pytest.approx(math.sqrt(math.pi) * math.exp(-1))
+    assert numerical_integrate("1", -1, 2, weight="cauchy", wvar=0) == pytest.approx(math.log(2))
+    assert numerical_integrate("1", 0, 1, weight="alg", wvar=[-0.5, 0]) == pytest.approx(2.0)
+    assert numerical_integrate("x", 0, 1, use_cache=False, full_output=True)["weight"] is None
+
+def test_numerical_integrate_weighted_singular_factor():
+    # 1/x is singular (or nearly so) at the lower end point, so auto keeps the plain product
+    result = numerical_integrate("sin(20*x)/x", 0, 10, use_cache=False, full_output=True)
+    assert result["weight"] is None
+    assert result["value"] == pytest.approx(1.5683823393394698) # Si(200)
+    result = numerical_integrate("sin(x)/x", 1e-9, 100, use_cache=False, full_output=True)
+    assert result["weight"] is None
+    assert result["value"] == pytest.approx(1.5622254658890562, rel=1e-12) # Si(100) - Si(1e-9)
+
+def test_numerical_integrate_weighted_invalid():
+    with pytest.raises(ValueError, match="Unknown weight function"):
+        numerical_integrate("x", 0, 1, weight="tan", wvar=1)
+    with pytest.raises(ValueError, match=r"requires wvar=\[alpha, beta\]"):
+        numerical_integrate("x", 0, 1, weight="alg", wvar=1)
+    with pytest.raises(ValueError, match="requires a numeric wvar"):
+        numerical_integrate("x", 0, 1, weight="cos")
+    with pytest.raises(ValueError, match="only supported with method='auto' or 'quad'"):
+        numerical_integrate("x", 0, 1, method="vectorized", weight="sin", wvar=1)
+
+def test_numerical_integrate_vectorized():
+    assert numerical_integrate("x", 0, 1, method="vectorized") == pytest.approx(0.5)
+    assert numerical_integrate("x**2", 0, 1, method="vectorized") == pytest.approx(1/3)
+    assert numerical_integrate("math.sin(x)", 0, math.pi, method="vectorized") == pytest.approx(2.0)
+    assert numerical_integrate("sqrt(x)", 0, 1, method="vectorized") == pytest.approx(2/3)
+    assert numerical_integrate("x", 1, 0, method="vectorized") == pytest.approx(-0.5)
+    assert numerical_integrate("1", 3, 3, method="vectorized") == 0.0
+    expression = "x**2 * sin(x) + exp(-x)"
+    assert numerical_integrate(expression, 0, 50, method="vectorized") == pytest.approx(numerical_integrate(expression, 0, 50))
+    # Out of panels: like quad, the best estimate comes back with a warning
+    with pytest.warns(UserWarning, match="panels"): # scipy's IntegrationWarning
+        result = numerical_integrate("1/sqrt(x)", 0, 1, method="vectorized", limit=3, use_cache=False, full_output=True)
+    assert not result["converged"]
+    assert result["value"] == pytest.approx(2, abs=3 * result["error"])
+
+def test_numerical_integrate_vectorized_invalid():
+    with pytest.raises(ValueError, match="Error during integration.*not finite"):
+        numerical_integrate("1/x", -1, 1, method="vectorized")
+    with pytest.raises(ValueError, match="Error during integration.*finite bounds"):
+        numerical_integrate("exp(-x)", 0, math.inf, method="vectorized")
+    with pytest.raises(ValueError, match="Unknown integration method"):
+        numerical_integrate("x", 0, 1, method="simpson")
+
+def test_numerical_integrate_parallel():
+    expression = "sin(3*x) * exp(-x/4) + log(1 + x)"
+    expected = numerical_integrate(expression, 0, 10, use_cache=False)
+    assert numerical_integrate(expression, 0, 10, use_cache=False, workers=2) == pytest.approx(expected)
+
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_numerical_integrate_parallel_concurrent():
+    # Calls asking for different pool sizes must not shut down each other's pool
+    expression = "sin(3*x) * exp(-x/4) + log(1 + x)"
+    expected = numerical_integrate(expression, 0, 10, use_cache=False)
+    results, errors = [], []
+
+    def run(workers):
+        try:
+            for _ in range(3):
+                results.append(numerical_integrate(expression, 0, 10, method="quad", use_cache=False, workers=workers))
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(workers,)) for workers in (2, 3, 4, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert results == pytest.approx([expected] * 12)
+
+def test_numerical_integrate_parallel_invalid():
+    with pytest.raises(ValueError, match="workers must be between"):
+        numerical_integrate("x", 0, 1, workers=0)
+    with pytest.raises(ValueError, match="only supported with method='auto' or 'quad'"):
+        numerical_integrate("x", 0, 1, method="vectorized", workers=2)
+    with pytest.raises(ValueError, match="requires finite bounds"):
+        numerical_integrate("exp(-x)", 0, math.inf, use_cache=False, workers=2)
+
+def test_numerical_integrate_full_output():
+    clear_integral_cache()
+    result = numerical_integrate("sin(x) * exp(-x)", 0, 10, full_output=True)
+    assert result["value"] == pytest.approx(0.5000313961543547)
+    assert 0 < result["error"] < 1e-8
+    assert result["evaluations"] > 0
+    assert result["method"] == "quad"
+    assert result["cached"] is False
+    assert numerical_integrate("sin(x) * exp(-x)", 0, 10, full_output=True)["cached"] is True
+    loose = numerical_integrate("sin(x) * exp(-x)", 0, 10, method="vectorized", epsabs=0, epsrel=1e-3, full_output=True)
+    assert loose["value"] == pytest.approx(result["value"], rel=1e-3)
+
+def test_numerical_integrate_budget():
+    clear_integral_cache()
+    # Out of budget: the best estimate so far comes back, flagged and uncached
+    for method, workers in (("quad", 1), ("vectorized", 1), ("quad", 2)):
+        with pytest.warns(UserWarning, match="budget exhausted"): # scipy's IntegrationWarning
+            result = numerical_integrate(
+                "sin(1/x)", 0.01, 1, method=method, workers=workers, max_evaluations=300, full_output=True
+            )
+        assert result["budget_exhausted"] is True and result["converged"] is False
+        assert 0 < result["evaluations"] <= 300
+        assert result["value"] == pytest.approx(0.5039818931754154, abs=result["error"])
+    assert numerical_integrate("sin(1/x)", 0.01, 1, method="quad", full_output=True)["cached"] is False
+    result = numerical_integrate("sin(1/x)", 0.01, 1, method="quad", use_cache=False, max_evaluations=10**5, full_output=True)
+    assert result["converged"] is True and result["budget_exhausted"] is False
+    # Not even one estimate fits
+    with pytest.raises(ValueError, match="more than 10 integrand evaluations"):
+        numerical_integrate("sin(x) * exp(-x)", 0, 10, use_cache=False, max_evaluations=10)
+    with pytest.raises(ValueError, match="more than 10 integrand evaluations"):
+        numerical_integrate("sin(x) * exp(-x)", 0, 10, method="vectorized", use_cache=False, max_evaluations=10)
+    with pytest.raises(ValueError, match="deadline has passed"):
+        numerical_integrate("sin(x) * exp(-x)", 0, 10, use_cache=False, deadline=1e-9)
+    with pytest.raises(ValueError, match="max_evaluations must be a positive integer"):
+        numerical_integrate("x", 0, 1, max_evaluations=0)
+    with pytest.raises(ValueError, match="must be non-negative"):
+        numerical_integrate("x", 0, 1, epsabs=-1)
+
+def test_integrate_batch():
+    assert integrate_batch("x**2", [[0, 1], [1, 2], [2, 3]]) == pytest.approx([1/3, 7/3, 19/3])
+    windows = [[k / 10, (k + 1) / 10] for k in range(200)]
+    values = integrate_batch("sin(x) * exp(-x)", windows)
+    assert values == pytest.approx([numerical_integrate("sin(x) * exp(-x)", a, b) for a, b in windows])
+    assert sum(values) == pytest.approx(numerical_integrate("sin(x) * exp(-x)", 0, 20))
+
+def test_integrate_batch_invalid():
+    with pytest.raises(ValueError, match="At least one pair of bounds is required."):
+        integrate_batch("x", [])
+    with pytest.raises(ValueError, match=r"list of \[lower_bound, upper_bound\] pairs"):
+        integrate_batch("x", [[0, 1, 2]])
+    with pytest.raises(ValueError, match=r"list of \[lower_bound, upper_bound\] pairs"):
+        integrate_batch("x", [[0, 1], [0]])
+    with pytest.raises(ValueError, match="Error during integration"):
+        integrate_batch("1/x", [[1, 2], [-1, 1]])
+
+def test_cumulative_integrate():
+    for method in ("simpson", "trapezoid", "gauss"):
+        result = cumulative_integrate("cos(x)", 0, math.pi, points=41, method=method)
+        assert result["x"][0] == 0 and result["x"][-1] == pytest.approx(math.pi)
+        assert result["values"] == pytest.approx([math.sin(x) for x in result["x"]], abs=1e-3)
+    result = cumulative_integrate("exp(x)", 0, 1, points=5, method="gauss", error_estimate=True)
+    assert result["values"] == pytest.approx([math.exp(x) - 1 for x in result["x"]])
+    assert len(result["error"]) == 5 and result["error"][0] == 0
+
+def test_cumulative_integrate_invalid():
+    with pytest.raises(ValueError, match="Unknown cumulative integration method"):
+        cumulative_integrate("x", 0, 1, method="romberg")
+    with pytest.raises(ValueError, match="points must be between"):
+        cumulative_integrate("x", 0, 1, points=1)
+    with pytest.raises(ValueError, match="Error during integration"):
+        cumulative_integrate("1/x", -1, 1, points=3)
+
+def test_integrate_samples():
+    x = [k / 16 for k in range(17)]
+    y = [value**3 for value in x]
+    assert integrate_samples(y, dx=1/16) == pytest.approx(0.25)
+    assert integrate_samples(y, x=x, method="trapezoid") == pytest.approx(0.25, rel=1e-2)
+    assert integrate_samples(y, dx=1/16, method="romberg") == pytest.approx(0.25)
+    packed = base64.b64encode(struct.pack(f"<{len(y)}d", *y)).decode()
+    assert integrate_samples(packed, dx=1/16) == pytest.approx(0.25)
+
+def test_integrate_samples_invalid():
+    with pytest.raises(ValueError, match="Unknown sample integration method"):
+        integrate_samples([1, 2], method="gauss")
+    with pytest.raises(ValueError, match="either x or dx"):
+        integrate_samples([1, 2], x=[0, 1], dx=1)
+    with pytest.raises(ValueError, match="same length"):
+        integrate_samples([1, 2, 3], x=[0, 1])
+    with pytest.raises(ValueError, match=r"2\*\*k \+ 1 samples"):
+        integrate_samples([1, 2, 3, 4], method="romberg")
+    with pytest.raises(ValueError, match="base64-encoded float64"):
+        integrate_samples("not base64!")
+
+def test_numerical_integrate_nd_gauss():
+    result = numerical_integrate_nd("x*y + z", {"x": [0, 1], "y": [0, 2], "z": [0, 1]})
+    assert result["method"] == "gauss"
+    assert result["value"] == pytest.approx(2.0)
+    assert result["error"] < 1e-8
+    result = numerical_integrate_nd("exp(-(x**2 + y**2))", {"x": [-3, 3], "y": [-3, 3]})
+    assert result["value"] == pytest.approx(math.pi * math.erf(3)**2)
+
+def test_numerical_integrate_nd_quasi_monte_carlo():
+    bounds = {f"x{i}": [0, 1] for i in range(1, 6)}
+    result = numerical_integrate_nd("x1*x2*x3*x4*x5", bounds)
+    assert result["method"] == "sobol"
+    assert result["value"] == pytest.approx(1/32, abs=1e-4)
+    assert 0 < result["error"] < 1e-4
+    result = numerical_integrate_nd("x1 + x2 + x3 + x4 + x5", bounds, method="halton", samples=4096)
+    assert result["value"] == pytest.approx(2.5, abs=1e-3)
+    assert result["evaluations"] == 8 * 4096
+
+def test_numerical_integrate_nd_invalid():
+    with pytest.raises(ValueError, match="Unknown integration method"):
+        numerical_integrate_nd("x", {"x": [0, 1]}, method="dblquad")
+    with pytest.raises(ValueError, match="Bounds must be finite."):
+        numerical_integrate_nd("x", {"x": [0, math.inf]})
+    with pytest.raises(ValueError, match="Error during integration"):
+        numerical_integrate_nd("x + w", {"x": [0, 1]})
+    # A kink stops the Gauss refinement at the node cap instead of running for minutes
+    with pytest.raises(ValueError, match="did not converge"):
+        numerical_integrate_nd("fabs(x-0.3)", {"x": [0, 1]})
+    with pytest.raises(ValueError, match="Too many points"):
+        numerical_integrate_nd("x0", {f"x{i}": [0, 1] for i in range(32)}, samples=10**6)
+
+def test_integral_result_cache():
+    clear_integral_cache()
+    first = numerical_integrate("x**2 + 2*x", 0, 3)
+    assert numerical_integrate("2*x + x**2", 0, 3) == first # Normalized variant
+    numerical_integrate("x**2 + 2*x", 0, 3, method="vectorized") # Different settings, new entry
+    info = get_integral_cache_info()
+    assert info["memory_hits"] == 1
+    assert info["misses"] == 2
+    assert info["size"] == 2
+    assert get_cache_stats()["integrals"] == info
+
+def test_integral_result_cache_disk_tier(tmp_path):
+    path = str(tmp_path / "integrals.sqlite")
+    configure_integral_cache(path=path)
+    try:
+        clear_integral_cache()
+        value = numerical_integrate("exp(-x) * sin(x)", 0, 2)
+        # Detach the disk tier and empty memory, then reattach it, as after a restart
+        configure_integral_cache(path=None)
+        clear_integral_cache()
+        configure_integral_cache(path=path)
+        assert numerical_integrate("exp(-x) * sin(x)", 0, 2) == value
+        assert get_integral_cache_info()["disk_hits"] == 1
+
+        configure_integral_cache(path=path, maxsize=0, disk_maxsize=2)
+        for upper in (1, 2, 3):
+            numerical_integrate("x", 0, upper)
+        assert get_integral_cache_info()["disk_size"] == 2
+    finally:
+        configure_integral_cache()
+        clear_integral_cache()
+
+def test_integral_result_cache_ttl(monkeypatch):
+    configure_integral_cache(ttl=10)
+    try:
+        clear_integral_cache()
+        numerical_integrate("x**3", 0, 1)
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 60)
+        numerical_integrate("x**3", 0, 1)
+        info = get_integral_cache_info()
+        assert info["expirations"] == 1
+        assert info["misses"] == 2
+    finally:
+        configure_integral_cache()
+        clear_integral_cache()
+
 def test_numerical_integrate_invalid_expression():
     with pytest.raises(ValueError, match="Error during integration"):
         numerical_integrate("1/x", -1, 1) # Singularity
@@ -153,6 +629,110 @@ def test_numerical_differentiate():
     # Derivative of exp(x) at x=0 is exp(0) = 1
     assert numerical_differentiate("math.exp(x)", 0) == pytest.approx(1.0)
 
+def test_numerical_differentiate_automatic():
+    # Forward-mode AD is exact, finite differences are not
+    assert numerical_differentiate("x**3 + 2*x", 2) == 14.0
+    assert numerical_differentiate("log(x, 2)", 3, method="ad") == pytest.approx(1 / (3 * math.log(2)), rel=1e-15)
+    assert numerical_differentiate("x**x", 2, method="ad") == pytest.approx(4 * (math.log(2) + 1), rel=1e-15)
+    assert numerical_differentiate("math.tanh(x) * fabs(x)", -1, method="ad") == pytest.approx(
+        (1 - math.tanh(1) ** 2) + math.tanh(1), rel=1e-15
+    )
+    assert numerical_differentiate("7", 1, method="ad") == 0.0
+    # No derivative rule or not differentiable: auto falls back to finite differences
+    assert numerical_differentiate("math.gamma(x)", 3) == pytest.approx(1.8455686679648884)
+    assert numerical_differentiate("math.gamma(x)", 3, method="finite_difference") == pytest.approx(1.8455686679648884)
+    with pytest.raises(ValueError, match="no derivative rule for 'gamma'"):
+        numerical_differentiate("math.gamma(x)", 3, method="ad")
+    with pytest.raises(ValueError, match="fabs is not differentiable at 0"):
+        numerical_differentiate("fabs(x)", 0, method="ad")
+    with pytest.raises(ValueError, match="Unknown differentiation method"):
+        numerical_differentiate("x", 0, method="complex_step")
+
+def test_differentiate_expression():
+    assert differentiate_expression("x**3 + 2*x") == "x ** 2 * 3 + 2"
+    assert differentiate_expression("7") == "0"
+    assert differentiate_expression("1/x") == "-1 / x ** 2"
+    # Variants with the same normal form share one cached derivative
+    assert differentiate_expression("2*x + x**3") == differentiate_expression("x**3 + 2*x")
+    derivative = differentiate_expression("exp(-x**2) * sin(3*x)")
+    assert evaluate_many(derivative, {"x": [1.1]})[0] == pytest.approx(
+        numerical_differentiate("exp(-x**2) * sin(3*x)", 1.1, method="ad"), rel=1e-14
+    )
+    with pytest.raises(ValueError, match="no symbolic derivative for 'math.gamma"):
+        differentiate_expression("math.gamma(x)")
+
+def test_numerical_differentiate_symbolic():
+    for expression in ("x**x", "log(x, 2) * math.tanh(x)", "math.hypot(x, 3) / (1 + x)", "(x + 1)**(x / 2)"):
+        assert numerical_differentiate(expression, 1.7, method="symbolic") == pytest.approx(
+            numerical_differentiate(expression, 1.7, method="ad"), rel=1e-14
+        )
+    # Undefined at the point: auto falls through to finite differences as before
+    assert numerical_differentiate("fabs(x)", 0) == pytest.approx(0.0)
+    with pytest.raises(ValueError, match="Error during differentiation"):
+        numerical_differentiate("fabs(x)", 0, method="symbolic")
+    # The formula 1/x exists at -1, but log(x) doesn't
+    for method in ("auto", "symbolic"):
+        with pytest.raises(ValueError, match="math domain error"):
+            numerical_differentiate("log(x)", -1, method=method)
+
+def test_differentiate_batch():
+    points = [0.1 * k for k in range(1, 50)]
+    result = differentiate_batch("x**3 + sin(x)", points)
+    assert result["values"] == pytest.approx([3 * x**2 + math.cos(x) for x in points])
+    assert all(result["success"])
+    # No symbolic rule for gamma: one vectorized finite-difference pass
+    result = differentiate_batch("math.gamma(x)", [2.5, 3.0])
+    assert result["values"] == pytest.approx([numerical_differentiate("math.gamma(x)", x) for x in (2.5, 3.0)])
+    # The derivative of sqrt is infinite at 0
+    result = differentiate_batch("sqrt(x)", [0, 1, 4], method="symbolic")
+    assert result["success"] == [False, True, True]
+    assert result["values"][1:] == pytest.approx([0.5, 0.25])
+    # log is undefined at -1 even though its derivative 1/x is not
+    for method in ("auto", "finite_difference"):
+        result = differentiate_batch("log(x)", [-1, 1, 2], method=method)
+        assert result["success"] == [False, True, True]
+        assert math.isnan(result["values"][0])
+        assert result["values"][1:] == pytest.approx([1, 0.5])
+
+def test_differentiate_batch_invalid():
+    with pytest.raises(ValueError, match="non-empty one-dimensional list"):
+        differentiate_batch("x", [])
+    with pytest.raises(ValueError, match="Unknown differentiation method"):
+        differentiate_batch("x", [1], method="ad")
+    with pytest.raises(ValueError, match="Error during differentiation"):
+        differentiate_batch("math.gamma(x)", [1], method="symbolic")
+
+def test_taylor_coefficients():
+    result = taylor_coefficients("exp(2*x)", 0, order=4)
+    assert result["method"] == "taylor"
+    assert result["derivatives"] == pytest.approx([1, 2, 4, 8, 16])
+    assert result["coefficients"] == pytest.approx([1, 2, 2, 4 / 3, 2 / 3])
+    assert taylor_coefficients("atan(x)", 0, order=7)["derivatives"] == pytest.approx([0, 1, 0, -2, 0, 24, 0, -720])
+    assert taylor_coefficients("log(x)", 1, order=5)["derivatives"] == pytest.approx([0, 1, -1, 2, -6, 24])
+    assert taylor_coefficients("x**x", 1, order=4)["derivatives"] == pytest.approx([1, 1, 2, 3, 8])
+    assert taylor_coefficients("math.hypot(x, 3)", 4, order=2)["derivatives"] == pytest.approx([5, 0.8, 0.072])
+    # The shared stencil agrees with Taylor mode to finite-difference accuracy
+    stencil = taylor_coefficients("sin(x) * exp(x)", 0.5, order=3, method="finite_difference")
+    assert stencil["method"] == "finite_difference"
+    assert stencil["derivatives"] == pytest.approx(taylor_coefficients("sin(x) * exp(x)", 0.5)["derivatives"], rel=1e-5)
+    # No Taylor rule for gamma: auto falls back to the stencil
+    assert taylor_coefficients("math.gamma(x)", 3, order=1)["derivatives"] == pytest.approx([2, 1.8455686679648884], rel=1e-6)
+
+def test_taylor_coefficients_invalid():
+    with pytest.raises(ValueError, match="order must be between"):
+        taylor_coefficients("x", 0, order=0)
+    with pytest.raises(ValueError, match="Unknown differentiation method"):
+        taylor_coefficients("x", 0, method="ad")
+    with pytest.raises(ValueError, match="no derivative rule for 'gamma'"):
+        taylor_coefficients("math.gamma(x)", 3, method="taylor")
+    # Not differentiable: no stencil fallback, which would return a large, meaningless f''(0)
+    with pytest.raises(ValueError, match="fabs is not differentiable at 0"):
+        taylor_coefficients("fabs(x)", 0, order=2)
+    with pytest.raises(ValueError, match="not differentiable at a jump"):
+        taylor_coefficients("math.floor(x)", 1)
+    with pytest.raises(ValueError, match="Numerical differentiation failed to converge"):
+        taylor_coefficients("sqrt(x)", 0, method="finite_difference")
+
 def test_numerical_differentiate_invalid_expression():
     with pytest.raises(ValueError, match="Error during differentiation"):
         numerical_differentiate("nonexistent_func(x)", 1)